@@ -0,0 +1,151 @@
+"""
+Startup benchmark for the VoC backend.
+
+Measures how long `import main` takes and the latency of the first request
+to each endpoint. Every measurement runs in a fresh interpreter so lazy
+imports are paid exactly once, the same way a new worker or a cold start
+would pay them.
+
+Usage (from the backend/ directory):
+    python bench_startup.py
+    python bench_startup.py --runs 5 --max-import-ms 500
+
+Requests are shaped to fail fast (unknown job ids, unreachable URL) so the
+numbers reflect import and framework cost rather than OpenAI or scraping.
+Background tasks are not run: TestClient would otherwise execute them before
+returning, and the scraping/analysis work would be counted as request latency.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Modules that must not be loaded by `import main` alone
+HEAVY_MODULES = [
+    "pandas",
+    "openai",
+    "bs4",
+    "google_play_scraper",
+    "app_store_scraper",
+    "boto3",
+]
+
+# (name, method, path, json payload)
+ENDPOINTS = [
+    ("root", "GET", "/", None),
+    ("check-status", "GET", "/api/check-status?job_id=bench", None),
+    ("analyze-website", "POST", "/api/analyze-website", {"website": "http://127.0.0.1:9"}),
+    ("appids", "POST", "/api/appids", []),
+    ("scrap-reviews", "POST", "/api/scrap-reviews", {"brands": [], "job_id": "bench"}),
+    ("scrapped-data", "POST", "/api/scrapped-data", {"job_id": "bench-missing"}),
+    ("final-analysis", "POST", "/api/final-analysis", {"dimensions": [], "file_key": "bench-missing.csv"}),
+]
+
+CHILD_SCRIPT = r"""
+import json, sys, time
+endpoint = json.loads(sys.argv[1])
+
+start = time.perf_counter()
+import main
+import_ms = (time.perf_counter() - start) * 1000
+heavy_loaded = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+
+# Scraping/analysis jobs are out of scope for the benchmark (see module docstring)
+from starlette.background import BackgroundTasks
+BackgroundTasks.add_task = lambda self, func, *args, **kwargs: None
+
+request_ms = None
+status_code = None
+if endpoint:
+    from fastapi.testclient import TestClient
+    client = TestClient(main.app)
+    name, method, path, payload = endpoint
+    start = time.perf_counter()
+    response = client.request(method, path, json=payload)
+    request_ms = (time.perf_counter() - start) * 1000
+    status_code = response.status_code
+
+print(json.dumps({
+    "import_ms": import_ms,
+    "request_ms": request_ms,
+    "status_code": status_code,
+    "heavy_loaded": heavy_loaded,
+}))
+"""
+
+
+def run_child(endpoint):
+    env = dict(os.environ)
+    # A dummy key lets /api/analyze-website reach the service import
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    env.pop("WARMUP_SERVICES", None)
+    proc = subprocess.run(
+        [sys.executable, "-c", CHILD_SCRIPT, json.dumps(endpoint), json.dumps(HEAVY_MODULES)],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed for {endpoint}:\n{proc.stderr}")
+    # The services may print/log; the JSON result is always the last line
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure VoC backend import time and first-request latency.")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="Fail if median import time exceeds this")
+    parser.add_argument("--max-request-ms", type=float, default=None, help="Fail if any median first-request latency exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    failures = []
+
+    import_runs = [run_child(None) for _ in range(args.runs)]
+    import_ms = statistics.median(r["import_ms"] for r in import_runs)
+    heavy_loaded = sorted({m for r in import_runs for m in r["heavy_loaded"]})
+    if heavy_loaded:
+        failures.append(f"`import main` loaded heavy modules: {', '.join(heavy_loaded)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import main took {import_ms:.1f} ms (budget {args.max_import_ms:.1f} ms)")
+
+    results = []
+    for endpoint in ENDPOINTS:
+        runs = [run_child(list(endpoint)) for _ in range(args.runs)]
+        request_ms = statistics.median(r["request_ms"] for r in runs)
+        results.append({
+            "endpoint": endpoint[0],
+            "path": endpoint[2],
+            "status_code": runs[-1]["status_code"],
+            "first_request_ms": request_ms,
+        })
+        if args.max_request_ms is not None and request_ms > args.max_request_ms:
+            failures.append(f"{endpoint[0]} first request took {request_ms:.1f} ms (budget {args.max_request_ms:.1f} ms)")
+
+    if args.json:
+        print(json.dumps({
+            "import_ms": import_ms,
+            "heavy_loaded": heavy_loaded,
+            "endpoints": results,
+            "failures": failures,
+        }, indent=2))
+    else:
+        print(f"import main: {import_ms:.1f} ms (median of {args.runs})")
+        print(f"heavy modules loaded at import: {', '.join(heavy_loaded) or 'none'}")
+        print()
+        print(f"{'endpoint':<18}{'status':>8}{'first request (ms)':>22}")
+        for r in results:
+            print(f"{r['endpoint']:<18}{r['status_code']:>8}{r['first_request_ms']:>22.1f}")
+        for f in failures:
+            print(f"FAIL: {f}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
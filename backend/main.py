@@ -1,23 +1,73 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import os
 import asyncio
+import base64
+import importlib
+import itertools
+import json
+import shutil
+import threading
 import uuid
 
-# Services
-from services.website import analyze_url
-from services.app_store import resolve_app_ids
-from services.reviews import run_scraper_service
-from services.analysis import generate_dimensions, analyze_reviews
+# Services are imported inside the endpoints that use them. They pull in
+# pandas, openai, bs4 and the store scrapers, which would otherwise slow down
+# worker start for cheap requests like `/` or `/api/check-status`.
 
 # Load environment variables
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# Set WARMUP_SERVICES=1 to load the heavy services in the background at startup
+WARMUP_SERVICES = os.getenv("WARMUP_SERVICES", "").lower() in ("1", "true", "yes")
 
-app = FastAPI(title="VoC Backend")
+SERVICE_MODULES = [
+    "services.website",
+    "services.app_store",
+    "services.reviews",
+    "services.analysis",
+    "services.storage",
+]
+
+# --- Warm-up ---
+def warm_up_services():
+    """
+    Imports the service modules and creates the shared OpenAI and S3
+    clients so the first real request does not pay for them.
+    """
+    for module in SERVICE_MODULES:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Warm-up import of {module} failed: {e}")
+
+    if OPENAI_API_KEY:
+        try:
+            from services.openai_client import get_openai_client
+            # Accessing a resource loads openai's lazily imported submodules
+            get_openai_client(OPENAI_API_KEY).chat.completions
+        except Exception as e:
+            print(f"Warm-up of OpenAI client failed: {e}")
+
+    from services import storage
+    if storage.is_enabled():
+        try:
+            storage.get_client()
+        except Exception as e:
+            print(f"Warm-up of S3 client failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app):
+    # Runs in a thread so the server starts accepting requests immediately
+    if WARMUP_SERVICES:
+        threading.Thread(target=warm_up_services, daemon=True).start()
+    yield
+
+app = FastAPI(title="VoC Backend", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -49,6 +99,12 @@ class ScrapRequest(BaseModel):
     brands: List[Company]
     job_id: Optional[str] = None
 
+def validate_id(value, name="job_id"):
+    # Ids are used in local file paths and object keys
+    from services import storage
+    if not storage.is_valid_id(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+
 # --- Endpoints ---
 
 @app.get("/")
@@ -60,6 +116,7 @@ async def api_analyze_website(request: WebsiteRequest):
     if not OPENAI_API_KEY:
         raise HTTPException(status_code=500, detail="OpenAI API Key not configured")
     
+    from services.website import analyze_url
     result = analyze_url(request.website, OPENAI_API_KEY)
     if "error" in result:
         raise HTTPException(status_code=500, detail=result["error"])
@@ -69,11 +126,14 @@ async def api_analyze_website(request: WebsiteRequest):
 async def api_appids(companies: List[Company]):
     # Convert Pydantic models to dicts, excluding nulls to avoid UI clutter
     valid_companies = [c.dict(exclude_none=True) for c in companies]
+    from services.app_store import resolve_app_ids
     result = resolve_app_ids(valid_companies, OPENAI_API_KEY)
     return result
 
 @app.post("/api/scrap-reviews")
 async def api_scrap_reviews(request: ScrapRequest, background_tasks: BackgroundTasks):
+    if request.job_id:
+        validate_id(request.job_id)
     job_id = request.job_id or str(uuid.uuid4())
     
     # Initialize Job Status
@@ -102,8 +162,12 @@ async def check_status(job_id: str):
 def process_scraping_job(job_id, brands_list):
     try:
         JOBS[job_id]["status"] = "running"
+        from services.reviews import run_scraper_service
         result = run_scraper_service(job_id, brands_list)
         
+        if result.get("status") == "completed":
+            result.update(export_dataset(job_id, result["file_path"]))
+        
         # Update Job Store with results
         JOBS[job_id].update(result) # result has status: completed/failed
         
@@ -112,8 +176,112 @@ def process_scraping_job(job_id, brands_list):
         JOBS[job_id]["status"] = "failed"
         JOBS[job_id]["message"] = str(e)
 
+def export_dataset(job_id, file_path):
+    """
+    Export stage: uploads the job dataset to object storage when a bucket is
+    configured. The local CSV is kept for dimension generation and analysis.
+    """
+    from services import storage
+    
+    location = {"s3_bucket": "local", "s3_key": file_path}
+    if not storage.is_enabled():
+        return location
+    
+    try:
+        JOBS[job_id]["message"] = "Exporting dataset"
+        export = storage.upload_file(file_path, storage.dataset_key(job_id))
+        location = {"s3_bucket": export["bucket"], "s3_key": export["key"]}
+    except Exception as e:
+        # Data is still available locally, so the job itself does not fail
+        print(f"Export of job {job_id} failed: {e}")
+        location["export_error"] = str(e)
+    return location
+
+def resolve_dataset(job_id):
+    """
+    Returns a local CSV path for the job, restoring it from the configured
+    bucket if this worker does not have it on disk.
+    """
+    from services import storage
+    
+    file_path = storage.local_dataset_path(job_id)
+    if os.path.exists(file_path):
+        return file_path
+    if storage.is_enabled():
+        return storage.download_file(storage.dataset_key(job_id), file_path)
+    return file_path
+
+def process_analysis_job(analysis_id, job_id, dimensions):
+    from services import storage
+    try:
+        JOBS[analysis_id]["status"] = "running"
+        from services.analysis import analyze_reviews
+        
+        file_path = resolve_dataset(job_id)
+        results_dir = storage.local_analysis_dir(analysis_id)
+        result = analyze_reviews(file_path, dimensions, OPENAI_API_KEY, results_dir)
+        if "error" in result:
+            raise RuntimeError(result["error"])
+        
+        result["results_page_size"] = storage.RESULTS_PAGE_SIZE
+        result.update(export_results(analysis_id, results_dir, result["results_pages"]))
+        result.update({"status": "completed", "message": "Analysis complete"})
+        JOBS[analysis_id].update(result)
+        
+    except Exception as e:
+        print(f"Analysis {analysis_id} failed: {e}")
+        JOBS[analysis_id]["status"] = "failed"
+        JOBS[analysis_id]["message"] = str(e)
+
+def export_results(analysis_id, results_dir, pages):
+    """
+    Export stage for analysis results: uploads the NDJSON part files when a
+    bucket is configured and removes the local copy once they are stored.
+    """
+    from services import storage
+    
+    location = {"s3_bucket": "local", "s3_key": results_dir}
+    if not storage.is_enabled():
+        return location
+    
+    try:
+        JOBS[analysis_id]["message"] = "Exporting results"
+        storage.upload_pages(results_dir, pages, lambda page: storage.analysis_key(analysis_id, page))
+        shutil.rmtree(results_dir, ignore_errors=True)
+        location = {
+            "s3_bucket": storage.S3_BUCKET,
+            "s3_key": storage.analysis_prefix(analysis_id),
+            "results_dir": None
+        }
+    except Exception as e:
+        # Results are still on disk and served from there
+        print(f"Export of analysis {analysis_id} failed: {e}")
+        location["export_error"] = str(e)
+    return location
+
+def iter_page_lines(analysis_id, job, page):
+    """Yields NDJSON lines (bytes) of one results page, from local disk or object storage."""
+    from services import storage
+    
+    if job.get("results_dir"):
+        return storage.iter_local_lines(os.path.join(job["results_dir"], storage.page_name(page)))
+    return storage.iter_lines(storage.analysis_key(analysis_id, page), bucket=job["s3_bucket"])
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(str(position).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        position = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if position < 0:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+# Sync endpoint: restoring the dataset from S3 blocks, so FastAPI runs it in a thread
 @app.post("/api/scrapped-data")
-async def api_scrapped_data2(request: dict):
+def api_scrapped_data2(request: dict):
     # n8n workflow "VoC Data Collection" -> trigger 1 of "VoC Analysis"
     # Expected payload via main flow: just needs s3_key or dimensions generation
     
@@ -124,19 +292,27 @@ async def api_scrapped_data2(request: dict):
     # For local dev, we might just look up job ID or file path
     # If s3_key is actually a job_id (from our file naming convention), let's use that.
     
-    job_id = s3_key.replace("scrapped_data/", "").replace(".csv", "") if s3_key else None
+    from services import storage
+    job_id = storage.job_id_from_key(s3_key) if s3_key else None
     
     if not job_id and "job_id" in request:
         job_id = request["job_id"]
         
-    # Read the data locally
-    if job_id:
-        file_path = f"backend/data/{job_id}.csv" 
-    else:
+    if not job_id:
         # Fallback/Mock
         return {"error": "Missing job_id or s3_key"}
+    validate_id(job_id)
         
     try:
+        import pandas as pd
+        from services.analysis import generate_dimensions
+
+        # Read the data locally, restoring it from object storage if needed
+        file_path = resolve_dataset(job_id)
+        location = {"s3_bucket": "local", "s3_key": file_path}
+        if JOBS.get(job_id, {}).get("s3_bucket", "local") != "local":
+            location = {"s3_bucket": JOBS[job_id]["s3_bucket"], "s3_key": JOBS[job_id]["s3_key"]}
+
         # Read sample
         df = pd.read_csv(file_path)
         sample = df.sample(n=min(10, len(df))).to_dict(orient='records')
@@ -147,8 +323,7 @@ async def api_scrapped_data2(request: dict):
             "message": "Dimensions generated",
             "body": { # replicating n8n structure slightly for frontend compatibility
                 "dimensions": dimensions,
-                "s3_bucket": "local", 
-                "s3_key": file_path 
+                **location
             }
         }
     except Exception as e:
@@ -156,27 +331,94 @@ async def api_scrapped_data2(request: dict):
         return {"error": str(e)}
 
 @app.post("/api/final-analysis")
-async def api_final_analysis(request: dict):
-    # Expected: { dimensions: [...], file_key: ... }
+async def api_final_analysis(request: dict, background_tasks: BackgroundTasks):
+    # Expected: { dimensions: [...], job_id: ... } or { dimensions: [...], file_key: ... }
+    # The bucket always comes from server config, never from the request.
     dimensions = request.get("dimensions", [])
-    file_path = request.get("file_key")
+    file_key = request.get("file_key")
+    
+    from services import storage
+    job_id = request.get("job_id") or (storage.job_id_from_key(file_key) if file_key else None)
     
-    if not file_path: 
+    if not job_id: 
         return {"error": "Missing file_key"}
-        
-    # Run Analysis
-    # In real world, this should also be a background task as it takes time!
-    # For now, running sync to keep it simple as per plan Phase 1/2
+    validate_id(job_id)
     
-    result = analyze_reviews(file_path, dimensions, OPENAI_API_KEY)
+    # Analysis runs in the background; results are written as paged NDJSON
+    # and, when a bucket is configured, exported to object storage. Poll
+    # /api/check-status with the analysis_id, then page through the results.
+    analysis_id = str(uuid.uuid4())
+    JOBS[analysis_id] = {
+        "type": "analysis",
+        "status": "pending",
+        "message": "Analysis started",
+        "created_at": str(asyncio.get_event_loop().time())
+    }
+    background_tasks.add_task(process_analysis_job, analysis_id, job_id, dimensions)
     
     # We could send an email here using a library if requested, 
     # but for now just return success to UI.
     
     return {
         "status": "success",
-        "message": "Analysis complete",
-        "result": result
+        "message": "Analysis started",
+        "analysis_id": analysis_id,
+        "results_url": f"/api/analysis-results/{analysis_id}"
+    }
+
+# Sync endpoint: reading results may block on disk/S3, so FastAPI runs it in a thread
+@app.get("/api/analysis-results/{analysis_id}")
+def api_analysis_results(
+    analysis_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+):
+    job = JOBS.get(analysis_id)
+    # JOBS also holds scraping jobs, which have no results pages
+    if not job or job.get("type") != "analysis":
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Analysis is {job['status']}")
+    
+    pages = job["results_pages"]
+    if format == "ndjson":
+        # Full download, streamed page by page
+        def stream():
+            for page in range(pages):
+                for line in iter_page_lines(analysis_id, job, page):
+                    yield line + b"\n"
+        return StreamingResponse(
+            stream(),
+            media_type="application/x-ndjson",
+            headers={"Content-Disposition": f'attachment; filename="{analysis_id}.ndjson"'}
+        )
+    
+    # The cursor is a record position; part files have a fixed size, so it maps
+    # straight to a page and only the pages holding the requested items are read
+    start = decode_cursor(cursor) if cursor else 0
+    total = job["results_count"]
+    page_size = job["results_page_size"]
+    
+    items = []
+    position = start
+    while position < total and len(items) < limit:
+        page, line = divmod(position, page_size)
+        lines = iter_page_lines(analysis_id, job, page)
+        try:
+            for raw in itertools.islice(lines, line, line + limit - len(items)):
+                items.append(json.loads(raw))
+        finally:
+            lines.close()
+        position = (page + 1) * page_size if len(items) < limit else start + len(items)
+    
+    end = start + len(items)
+    return {
+        "analysis_id": analysis_id,
+        "total": total,
+        "limit": limit,
+        "next_cursor": encode_cursor(end) if end < total else None,
+        "items": items
     }
 
 if __name__ == "__main__":
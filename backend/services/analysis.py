@@ -1,5 +1,6 @@
 import pandas as pd
-from openai import OpenAI
+from services.openai_client import get_openai_client
+from services import storage
 import json
 import logging
 import os
@@ -12,7 +13,7 @@ def generate_dimensions(reviews_sample, openai_key):
     """
     Analyzes a sample of reviews to suggest relevant analysis axes.
     """
-    client = OpenAI(api_key=openai_key)
+    client = get_openai_client(openai_key)
     
     # Format reviews for prompt
     reviews_text = "\n".join([f"- {r.get('text', '')}" for r in reviews_sample[:10]])
@@ -56,72 +57,97 @@ def generate_dimensions(reviews_sample, openai_key):
         logger.error(f"Error generating dimensions: {e}")
         return []
 
-def analyze_reviews(file_path, dimensions, openai_key):
+def analyze_reviews(file_path, dimensions, openai_key, results_dir):
     """
     Reads CSV, batches reviews, and sends to OpenAI for sentiment/topic analysis.
+    Per-review results are written to results_dir as paged NDJSON part files
+    (see storage.write_pages) instead of being held in memory.
     """
     try:
         df = pd.read_csv(file_path)
     except Exception as e:
         return {"error": f"Could not read file: {e}"}
         
-    client = OpenAI(api_key=openai_key)
+    client = get_openai_client(openai_key)
     
     # Limit for prototype: Analyze top 50 reviews to save tokens/time
     # In production, use background worker + batching
     df_sample = df.head(50).copy()
     
-    analyzed_results = []
-    
     # Prepare dimensions string
     dims_str = "\n".join([f"- {d['dimension']}: {d['description']}" for d in dimensions])
     
     # Batch processing
     batch_size = 10
-    total_batches = (len(df_sample) // batch_size) + 1
     
-    for i in range(0, len(df_sample), batch_size):
-        batch = df_sample.iloc[i:i+batch_size]
-        batch_texts = []
-        for idx, row in batch.iterrows():
-            batch_texts.append(f"ID {idx}: {row['text']}")
+    def iter_records():
+        for i in range(0, len(df_sample), batch_size):
+            batch = df_sample.iloc[i:i+batch_size]
+            batch_texts = []
+            for idx, row in batch.iterrows():
+                batch_texts.append(f"ID {idx}: {row['text']}")
+                
+            reviews_str = "\n".join(batch_texts)
+            prompt = f"""
+            Analyze the following reviews based on these dimensions:
+            {dims_str}
             
-        reviews_str = "\n".join(batch_texts)
-        prompt = f"""
-        Analyze the following reviews based on these dimensions:
-        {dims_str}
-        
-        Reviews:
-        {reviews_str}
-        
-        For EACH review, return a JSON object keyed by ID with:
-        - sentiment_score: -1 to 1
-        - sentiment_label: Positive, Neutral, Negative
-        - topics: List of dimensions from the provided list that are mentioned.
-        """
-        
-        try:
-            completion = client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are an expert sentiment analyst. Return ONLY JSON."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={ "type": "json_object" }
-            )
-            content = completion.choices[0].message.content
-            # Expected: { "ID 0": { ... }, "ID 1": { ... } }
-            batch_result = json.loads(content)
-            analyzed_results.append(batch_result)
+            Reviews:
+            {reviews_str}
+            
+            For EACH review, return a JSON object keyed by ID with:
+            - sentiment_score: -1 to 1
+            - sentiment_label: Positive, Neutral, Negative
+            - topics: List of dimensions from the provided list that are mentioned.
+            """
             
-        except Exception as e:
-            logger.error(f"Error analyzing batch {i}: {e}")
+            try:
+                completion = client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": "You are an expert sentiment analyst. Return ONLY JSON."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    response_format={ "type": "json_object" }
+                )
+                content = completion.choices[0].message.content
+                # Expected: { "ID 0": { ... }, "ID 1": { ... } }
+                batch_result = json.loads(content)
+                
+            except Exception as e:
+                logger.error(f"Error analyzing batch {i}: {e}")
+                continue
             
-    # Merge results back (simplified visualization for now)
-    # Ideally we update the DF and save a new CSV
+            # to_json handles NaN and numpy types for the review columns
+            rows = dict(zip(batch.index, json.loads(batch.to_json(orient="records"))))
+            for key, analysis in batch_result.items():
+                record = to_review_record(key, analysis, rows)
+                yield json.dumps(record, ensure_ascii=False)
+    
+    results_count, results_pages = storage.write_pages(iter_records(), results_dir)
     
     return {
         "total_reviews": len(df),
         "analyzed_count": len(df_sample),
-        "results": analyzed_results
+        "results_count": results_count,
+        "results_pages": results_pages,
+        "results_dir": results_dir
     }
+
+def to_review_record(key, analysis, rows):
+    """
+    Merges one model result ("ID 3": {...}) with the review it refers to.
+    """
+    review_id = str(key).replace("ID", "").strip()
+    try:
+        review_id = int(review_id)
+    except ValueError:
+        review_id = str(key)
+    
+    record = {"review_id": review_id}
+    record.update(rows.get(review_id, {}))
+    if isinstance(analysis, dict):
+        record.update(analysis)
+    else:
+        record["analysis"] = analysis
+    return record
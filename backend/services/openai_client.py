@@ -0,0 +1,10 @@
+import functools
+from openai import OpenAI
+
+@functools.lru_cache(maxsize=None)
+def get_openai_client(openai_key):
+    """
+    Shared OpenAI client per API key. The client is thread-safe and keeps its
+    HTTP connection pool, so services reuse it instead of building one per call.
+    """
+    return OpenAI(api_key=openai_key)
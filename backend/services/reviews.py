@@ -3,18 +3,16 @@ from google_play_scraper import Sort, reviews
 import requests
 import json
 import os
-import boto3
 from datetime import datetime
 import concurrent.futures
 import logging
+from services.storage import DATA_DIR
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Config
-DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
-os.makedirs(DATA_DIR, exist_ok=True)
 RUN_GOOGLE_PLAY = True
 RUN_APP_STORE = True
 COUNTRIES = ['sa', 'ae', 'kw', 'bh', 'qa', 'om', 'us']
@@ -175,6 +173,7 @@ def run_scraper_service(job_id, brands_list):
         final_df = pd.concat(all_dfs, ignore_index=True)
         final_df.drop_duplicates(subset=['text', 'source_user', 'date', 'brand'], inplace=True)
         
+        os.makedirs(DATA_DIR, exist_ok=True)
         filename = f"{job_id}.csv"
         file_path = os.path.join(DATA_DIR, filename)
         final_df.to_csv(file_path, index=False, encoding='utf-8-sig')
@@ -0,0 +1,245 @@
+import concurrent.futures
+import functools
+import itertools
+import logging
+import os
+import re
+import tempfile
+import threading
+import zlib
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Config
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
+# Export is enabled only when a bucket is configured; otherwise files stay local
+S3_BUCKET = os.getenv("S3_BUCKET")
+# Set for S3-compatible stores such as MinIO (e.g. http://localhost:9000)
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")
+PART_SIZE = int(os.getenv("S3_PART_SIZE_MB", "8")) * 1024 * 1024  # S3 minimum is 5 MB
+MAX_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+READ_CHUNK_SIZE = 1024 * 1024
+# Analysis results are split into part files of this many records so a page
+# can be served without reading the records before it
+RESULTS_PAGE_SIZE = 1000
+GZIP_WBITS = 31  # zlib wbits for a gzip container
+
+# Process-wide cap on compressed parts held in memory, shared by every
+# concurrent upload (including the ones started by upload_pages)
+_part_slots = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+def is_enabled():
+    return bool(S3_BUCKET)
+
+@functools.lru_cache(maxsize=1)
+def get_client():
+    """Shared S3 client. boto3 is imported here to keep it off the startup path."""
+    import boto3
+    return boto3.client("s3", endpoint_url=S3_ENDPOINT_URL or None)
+
+# --- Keys & Paths ---
+ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+def is_valid_id(value):
+    """Job/analysis ids end up in file paths and keys, so only allow safe names."""
+    return isinstance(value, str) and bool(ID_PATTERN.match(value))
+
+def dataset_key(job_id):
+    return f"scrapped_data/{job_id}.csv.gz"
+
+def page_name(page):
+    return f"part-{page:05d}.ndjson"
+
+def analysis_prefix(analysis_id):
+    return f"analysis_results/{analysis_id}/"
+
+def analysis_key(analysis_id, page):
+    return f"{analysis_prefix(analysis_id)}{page_name(page)}.gz"
+
+def local_dataset_path(job_id):
+    return os.path.join(DATA_DIR, f"{job_id}.csv")
+
+def local_analysis_dir(analysis_id):
+    return os.path.join(DATA_DIR, f"{analysis_id}_analysis")
+
+def job_id_from_key(key):
+    """Accepts an S3 key or a local path, e.g. scrapped_data/<job_id>.csv.gz"""
+    name = os.path.basename(key)
+    for suffix in (".gz", ".csv"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+# --- Upload ---
+def _compressed_parts(file_path, part_size):
+    """Yields gzip-compressed chunks of the file, each at least part_size except the last."""
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    buffer = bytearray()
+    with open(file_path, "rb") as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk: break
+            buffer += compressor.compress(chunk)
+            if len(buffer) >= part_size:
+                yield bytes(buffer)
+                buffer.clear()
+    buffer += compressor.flush()
+    yield bytes(buffer)
+
+def _upload_part(client, bucket, key, upload_id, part_number, body):
+    resp = client.upload_part(
+        Bucket=bucket, Key=key, UploadId=upload_id,
+        PartNumber=part_number, Body=body
+    )
+    return {"PartNumber": part_number, "ETag": resp["ETag"]}
+
+def _release_part_slot(future):
+    _part_slots.release()
+
+def upload_file(file_path, key, bucket=None):
+    """
+    Streams a local file to S3 as gzip. Parts are compressed while reading and
+    uploaded concurrently. A slot is taken before each part is compressed and
+    returned once it is uploaded, so at most MAX_CONCURRENCY parts are held in
+    memory across all uploads in the process.
+    """
+    bucket = bucket or S3_BUCKET
+    client = get_client()
+
+    # Files no bigger than one part compress to (about) one part, a plain PUT is cheaper
+    if os.path.getsize(file_path) <= PART_SIZE:
+        with _part_slots:
+            body = b"".join(_compressed_parts(file_path, PART_SIZE))
+            client.put_object(Bucket=bucket, Key=key, Body=body, ContentType="application/gzip")
+        logger.info(f"Exported {file_path} to s3://{bucket}/{key} (1 part, {len(body)} bytes)")
+        return {"bucket": bucket, "key": key, "parts": 1, "size": len(body)}
+
+    parts_iter = _compressed_parts(file_path, PART_SIZE)
+    upload_id = client.create_multipart_upload(
+        Bucket=bucket, Key=key, ContentType="application/gzip"
+    )["UploadId"]
+    try:
+        futures = []
+        size = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+            for part_number in itertools.count(1):
+                # Back-pressure: wait for a slot before compressing more of the file
+                _part_slots.acquire()
+                try:
+                    body = next(parts_iter, None)
+                    if body is not None:
+                        future = executor.submit(_upload_part, client, bucket, key, upload_id, part_number, body)
+                except BaseException:
+                    _part_slots.release()
+                    raise
+                if body is None:
+                    _part_slots.release()
+                    break
+                future.add_done_callback(_release_part_slot)
+                futures.append(future)
+                size += len(body)
+                # Stop early instead of compressing the rest of a failed upload
+                for done in futures:
+                    if done.done() and done.exception(): done.result()
+            parts = [future.result() for future in futures]
+
+        client.complete_multipart_upload(
+            Bucket=bucket, Key=key, UploadId=upload_id,
+            MultipartUpload={"Parts": parts}
+        )
+    except Exception:
+        client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+    logger.info(f"Exported {file_path} to s3://{bucket}/{key} ({len(parts)} parts, {size} bytes)")
+    return {"bucket": bucket, "key": key, "parts": len(parts), "size": size}
+
+def upload_pages(directory, pages, key_for_page, bucket=None):
+    """Uploads part files written by write_pages, several at a time."""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as executor:
+        futures = [
+            executor.submit(upload_file, os.path.join(directory, page_name(page)), key_for_page(page), bucket)
+            for page in range(pages)
+        ]
+        return [future.result() for future in futures]
+
+# --- Paged NDJSON ---
+def write_pages(lines, directory, page_size=None):
+    """
+    Writes NDJSON lines (str, without newline) into part-00000.ndjson,
+    part-00001.ndjson, ... with page_size lines each. Returns (count, pages).
+    """
+    page_size = page_size or RESULTS_PAGE_SIZE
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    out = None
+    try:
+        for line in lines:
+            if count % page_size == 0:
+                if out: out.close()
+                out = open(os.path.join(directory, page_name(count // page_size)), "w", encoding="utf-8")
+            out.write(line + "\n")
+            count += 1
+    finally:
+        if out: out.close()
+    pages = (count + page_size - 1) // page_size
+    return count, pages
+
+def iter_local_lines(file_path):
+    """Yields lines (bytes, without newline) of a local NDJSON file."""
+    with open(file_path, "rb") as f:
+        for line in f:
+            line = line.rstrip(b"\n")
+            if line: yield line
+
+# --- Download ---
+def iter_bytes(key, bucket=None):
+    """Yields the decompressed content of a gzip object without buffering it whole."""
+    bucket = bucket or S3_BUCKET
+    body = get_client().get_object(Bucket=bucket, Key=key)["Body"]
+    try:
+        decompressor = zlib.decompressobj(wbits=GZIP_WBITS)
+        for chunk in body.iter_chunks(READ_CHUNK_SIZE):
+            data = decompressor.decompress(chunk)
+            if data: yield data
+        data = decompressor.flush()
+        if data: yield data
+    finally:
+        # Also runs when the consumer stops early, releasing the pooled connection
+        body.close()
+
+def iter_lines(key, bucket=None):
+    """Yields lines (bytes, without newline) of a gzip object, e.g. NDJSON records."""
+    chunks = iter_bytes(key, bucket)
+    try:
+        pending = b""
+        for data in chunks:
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if line: yield line
+        if pending: yield pending
+    finally:
+        chunks.close()
+
+def download_file(key, file_path, bucket=None):
+    """
+    Restores a gzip object to a local (decompressed) file. Each call writes to
+    its own temp file, so concurrent restores of the same dataset cannot mix.
+    """
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=directory, suffix=".part", delete=False) as f:
+            tmp_path = f.name
+            for data in iter_bytes(key, bucket):
+                f.write(data)
+        os.replace(tmp_path, file_path)
+    finally:
+        # Only left behind when the download failed
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return file_path
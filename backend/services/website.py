@@ -1,6 +1,6 @@
 import requests
 from bs4 import BeautifulSoup
-from openai import OpenAI
+from services.openai_client import get_openai_client
 import json
 import logging
 import os
@@ -42,7 +42,7 @@ def analyze_url(url: str, openai_key: str):
                 app_links.append(href)
         
         # 2. Call OpenAI
-        client = OpenAI(api_key=openai_key)
+        client = get_openai_client(openai_key)
         
         prompt = f"""
         Analyze the following website content and extract information about the company.
@@ -0,0 +1,277 @@
+import gzip
+import json
+import os
+import threading
+import time
+import types
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+from moto import mock_aws
+
+import main
+from services import storage
+import services.analysis as analysis
+
+BUCKET = "voc-test"
+
+@pytest.fixture
+def s3(monkeypatch, tmp_path):
+    """A moto-backed bucket, with storage pointed at it and at a temp data dir."""
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setattr(storage, "S3_BUCKET", BUCKET)
+    monkeypatch.setattr(storage, "S3_ENDPOINT_URL", None)
+    monkeypatch.setattr(storage, "DATA_DIR", str(tmp_path / "data"))
+    with mock_aws():
+        storage.get_client.cache_clear()
+        client = storage.get_client()
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+    storage.get_client.cache_clear()
+
+# --- Upload / Download ---
+
+def test_upload_file_multipart_round_trip(s3, monkeypatch, tmp_path):
+    # Same as S3_PART_SIZE_MB=5, the smallest part size S3 accepts
+    monkeypatch.setattr(storage, "PART_SIZE", 5 * 1024 * 1024)
+    data = os.urandom(12 * 1024 * 1024)  # incompressible, so it needs several parts
+    file_path = tmp_path / "big.bin"
+    file_path.write_bytes(data)
+
+    result = storage.upload_file(str(file_path), "test/big.bin.gz")
+
+    assert result["parts"] > 1
+    assert b"".join(storage.iter_bytes("test/big.bin.gz")) == data
+    raw = s3.get_object(Bucket=BUCKET, Key="test/big.bin.gz")["Body"].read()
+    assert gzip.decompress(raw) == data
+
+def test_upload_file_aborts_when_a_part_fails(s3, monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "PART_SIZE", 5 * 1024 * 1024)
+    file_path = tmp_path / "big.bin"
+    file_path.write_bytes(os.urandom(12 * 1024 * 1024))
+
+    upload_part = s3.upload_part
+    def failing_upload_part(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise RuntimeError("connection reset")
+        return upload_part(**kwargs)
+    monkeypatch.setattr(s3, "upload_part", failing_upload_part)
+
+    with pytest.raises(RuntimeError, match="connection reset"):
+        storage.upload_file(str(file_path), "test/big.bin.gz")
+
+    assert not s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads")
+    assert s3.list_objects_v2(Bucket=BUCKET)["KeyCount"] == 0
+
+def test_iter_lines_across_chunk_boundaries(s3, monkeypatch, tmp_path):
+    # Tiny chunks so lines are split across reads and decompressed blocks
+    monkeypatch.setattr(storage, "READ_CHUNK_SIZE", 7)
+    lines = [json.dumps({"id": i, "text": "x" * (i % 13)}) for i in range(200)]
+    file_path = tmp_path / "lines.ndjson"
+    file_path.write_text("\n".join(lines) + "\n")
+    storage.upload_file(str(file_path), "test/lines.ndjson.gz")
+
+    assert [line.decode() for line in storage.iter_lines("test/lines.ndjson.gz")] == lines
+
+def test_iter_lines_closes_body_when_stopped_early(s3, monkeypatch, tmp_path):
+    file_path = tmp_path / "lines.ndjson"
+    file_path.write_text("\n".join(str(i) for i in range(100)) + "\n")
+    storage.upload_file(str(file_path), "test/lines.ndjson.gz")
+
+    closed = []
+    get_object = s3.get_object
+    def tracking_get_object(**kwargs):
+        resp = get_object(**kwargs)
+        body_close = resp["Body"].close
+        resp["Body"].close = lambda: (closed.append(True), body_close())
+        return resp
+    monkeypatch.setattr(s3, "get_object", tracking_get_object)
+
+    lines = storage.iter_lines("test/lines.ndjson.gz")
+    assert next(lines) == b"0"
+    lines.close()
+    assert closed == [True]
+
+def test_uploads_share_the_part_memory_limit(s3, monkeypatch, tmp_path):
+    monkeypatch.setattr(storage, "PART_SIZE", 5 * 1024 * 1024)
+    monkeypatch.setattr(storage, "_part_slots", threading.BoundedSemaphore(2))
+    for page in range(3):
+        (tmp_path / storage.page_name(page)).write_bytes(os.urandom(11 * 1024 * 1024))
+
+    lock = threading.Lock()
+    active, peak = [0], [0]
+    upload_part = storage._upload_part
+    def tracking_upload_part(*args):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        try:
+            return upload_part(*args)
+        finally:
+            with lock: active[0] -= 1
+    monkeypatch.setattr(storage, "_upload_part", tracking_upload_part)
+
+    # upload_pages runs several multipart uploads at once; they still share 2 slots
+    results = storage.upload_pages(str(tmp_path), 3, lambda page: f"test/{page}.gz")
+    assert all(r["parts"] > 1 for r in results)
+    assert peak[0] <= 2
+
+def test_download_file_leaves_no_temp_file_on_failure(s3, tmp_path):
+    target = tmp_path / "restore" / "job1.csv"
+    with pytest.raises(Exception, match="NoSuchKey"):
+        storage.download_file("scrapped_data/missing.csv.gz", str(target))
+    assert os.listdir(target.parent) == []
+
+def test_concurrent_downloads_of_the_same_file(s3, tmp_path):
+    data = b"".join(f"row {i},{'x' * 50}\n".encode() for i in range(100000))
+    source = tmp_path / "job1.csv"
+    source.write_bytes(data)
+    storage.upload_file(str(source), "scrapped_data/job1.csv.gz")
+
+    target = tmp_path / "restore" / "job1.csv"
+    errors = []
+    def restore():
+        try: storage.download_file("scrapped_data/job1.csv.gz", str(target))
+        except Exception as e: errors.append(e)
+    threads = [threading.Thread(target=restore) for _ in range(4)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+
+    assert not errors
+    assert target.read_bytes() == data
+    assert os.listdir(target.parent) == ["job1.csv"]
+
+# --- Analysis results API ---
+
+class FakeCompletions:
+    """Answers every batch with a fixed analysis per "ID n" line of the prompt."""
+    def create(self, messages, **kwargs):
+        ids = [line.split(":")[0].strip() for line in messages[1]["content"].splitlines() if line.strip().startswith("ID ")]
+        body = {i: {"sentiment_score": 0.5, "sentiment_label": "Positive", "topics": []} for i in ids}
+        message = types.SimpleNamespace(content=json.dumps(body))
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+@pytest.fixture
+def api(monkeypatch):
+    fake_client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=FakeCompletions()))
+    monkeypatch.setattr(analysis, "get_openai_client", lambda key: fake_client)
+    monkeypatch.setattr(storage, "RESULTS_PAGE_SIZE", 10)
+    monkeypatch.setattr(main, "JOBS", {})
+    return TestClient(main.app)
+
+def write_dataset(job_id, count=25):
+    os.makedirs(storage.DATA_DIR, exist_ok=True)
+    pd.DataFrame({
+        "text": [f"review {i}" for i in range(count)],
+        "rating": [5] * count,
+        "brand": "Brand",
+        "platform": "Google Play (US)",
+    }).to_csv(storage.local_dataset_path(job_id), index=False)
+
+def run_analysis(api, job_id):
+    resp = api.post("/api/final-analysis", json={"dimensions": [{"dimension": "Price", "description": "Cost"}], "job_id": job_id})
+    assert resp.status_code == 200
+    analysis_id = resp.json()["analysis_id"]
+    # TestClient runs the background task before returning
+    assert api.get(f"/api/check-status?job_id={analysis_id}").json()["status"] == "completed"
+    return analysis_id
+
+def read_all_pages(api, analysis_id, limit):
+    items, cursor, calls = [], None, 0
+    while True:
+        params = {"limit": limit}
+        if cursor: params["cursor"] = cursor
+        page = api.get(f"/api/analysis-results/{analysis_id}", params=params).json()
+        items.extend(page["items"])
+        calls += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return items, calls
+
+def test_analysis_results_pages_from_s3(s3, api):
+    write_dataset("job1")
+    analysis_id = run_analysis(api, "job1")
+
+    job = main.JOBS[analysis_id]
+    assert job["s3_bucket"] == BUCKET
+    assert job["results_pages"] == 3
+    keys = [o["Key"] for o in s3.list_objects_v2(Bucket=BUCKET, Prefix=storage.analysis_prefix(analysis_id))["Contents"]]
+    assert keys == [storage.analysis_key(analysis_id, page) for page in range(3)]
+    assert not os.path.exists(storage.local_analysis_dir(analysis_id))
+
+    # limit 7 does not line up with the 10-record part files
+    items, calls = read_all_pages(api, analysis_id, limit=7)
+    assert [item["review_id"] for item in items] == list(range(25))
+    assert items[0]["text"] == "review 0" and items[0]["sentiment_label"] == "Positive"
+    assert calls == 4
+
+    last = api.get(f"/api/analysis-results/{analysis_id}", params={"limit": 25}).json()
+    assert len(last["items"]) == 25 and last["next_cursor"] is None
+
+def test_analysis_results_page_reads_only_its_parts(s3, api, monkeypatch):
+    write_dataset("job1")
+    analysis_id = run_analysis(api, "job1")
+    first = api.get(f"/api/analysis-results/{analysis_id}", params={"limit": 18}).json()
+
+    fetched = []
+    get_object = s3.get_object
+    def tracking_get_object(**kwargs):
+        fetched.append(kwargs["Key"])
+        return get_object(**kwargs)
+    monkeypatch.setattr(s3, "get_object", tracking_get_object)
+
+    page = api.get(f"/api/analysis-results/{analysis_id}", params={"limit": 5, "cursor": first["next_cursor"]}).json()
+    assert [item["review_id"] for item in page["items"]] == list(range(18, 23))
+    assert fetched == [storage.analysis_key(analysis_id, 1), storage.analysis_key(analysis_id, 2)]
+
+def test_analysis_results_ndjson_download(s3, api):
+    write_dataset("job1")
+    analysis_id = run_analysis(api, "job1")
+
+    resp = api.get(f"/api/analysis-results/{analysis_id}", params={"format": "ndjson"})
+    assert resp.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line)["review_id"] for line in resp.text.splitlines()] == list(range(25))
+
+def test_analysis_restores_dataset_from_s3(s3, api):
+    write_dataset("job1")
+    storage.upload_file(storage.local_dataset_path("job1"), storage.dataset_key("job1"))
+    os.remove(storage.local_dataset_path("job1"))
+
+    analysis_id = run_analysis(api, "job1")
+    assert main.JOBS[analysis_id]["results_count"] == 25
+
+def test_analysis_export_failure_keeps_local_results(s3, api, monkeypatch):
+    def failing_upload_pages(*args, **kwargs):
+        raise RuntimeError("bucket unavailable")
+    monkeypatch.setattr(storage, "upload_pages", failing_upload_pages)
+    write_dataset("job1")
+
+    analysis_id = run_analysis(api, "job1")
+
+    job = main.JOBS[analysis_id]
+    assert job["s3_bucket"] == "local"
+    assert job["export_error"] == "bucket unavailable"
+    items, _ = read_all_pages(api, analysis_id, limit=10)
+    assert len(items) == 25
+
+def test_invalid_ids_are_rejected(s3, api):
+    for job_id in ["../../../tmp/x", "a/b", "x.csv"]:
+        assert api.post("/api/final-analysis", json={"dimensions": [], "job_id": job_id}).status_code == 400
+        assert api.post("/api/scrapped-data", json={"job_id": job_id}).status_code == 400
+        assert api.post("/api/scrap-reviews", json={"brands": [], "job_id": job_id}).status_code == 400
+    assert not os.path.exists(storage.DATA_DIR) or os.listdir(storage.DATA_DIR) == []
+
+def test_invalid_cursor_is_rejected(s3, api):
+    write_dataset("job1")
+    analysis_id = run_analysis(api, "job1")
+    resp = api.get(f"/api/analysis-results/{analysis_id}", params={"cursor": "not a cursor!"})
+    assert resp.status_code == 400
+
+def test_analysis_results_rejects_scraping_jobs(s3, api):
+    main.JOBS["scrapejob"] = {"status": "completed", "message": "Scraping successful"}
+    resp = api.get("/api/analysis-results/scrapejob")
+    assert resp.status_code == 404
@@ -97,6 +97,7 @@ export function SuccessView({ jobId, onReset }: SuccessViewProps) {
         try {
             await VoCService.submitDimensions({
                 dimensions: dimensions,
+                job_id: jobId,
                 // mock bucket/key if missing, as per original logic
                 bucket_name: data?.s3_bucket || 'simulation',
                 file_key: data?.s3_key || 'simulation.pdf'
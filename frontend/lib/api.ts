@@ -30,6 +30,7 @@ export interface ScrapRequest {
 export interface JobStatus {
     status: 'pending' | 'running' | 'completed' | 'failed';
     message: string;
+    s3_bucket?: string;
     s3_key?: string;
     summary?: string;
     dashboard_link?: string;